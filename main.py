@@ -1,14 +1,119 @@
+import os
+import pickle
+from multiprocessing import Pool
+
 import numpy as np
 import pandapower as pp
-import matplotlib.pyplot as plt
 
 from networks import ieee123, twobus_net, star_network
-from plotting import set_plot_style
 from powerflow import get_svd
-from metrics import compute_margins
+from metrics import compute_margins, prepare_net
+
+try:
+    import lightsim2grid  # noqa: F401
+    LIGHTSIM2GRID_AVAILABLE = True
+except ImportError:
+    LIGHTSIM2GRID_AVAILABLE = False
+
+# Newton-Raphson settings shared by every sweep point
+PF_OPTIONS = dict(algorithm="nr", calculate_voltage_angles=True, max_iteration=50, tolerance_mva=1e-8,
+                  numba=True, lightsim2grid=LIGHTSIM2GRID_AVAILABLE)
+# Along a load sweep only bus P/Q change; branch and generator data stay fixed
+PF_RECYCLE = dict(bus_pq=True, trafo=False, gen=False)
+
+
+# Per-worker copy of the network, deserialized once by the pool initializer
+_worker_net = None
+# Per-worker sweep-invariant data, built after the worker's first solved point
+_worker_prepared = None
+
+
+def _init_worker(net_bytes):
+    """Deserialize the network once per worker process."""
+    global _worker_net
+    _worker_net = pickle.loads(net_bytes)
+    # Start each worker from a flat start rather than from stored internals
+    _worker_net.converged = False
+
+
+def _keys_values(d):
+    """Split a metric dict into a key list and a float array of its values."""
+    return list(d.keys()), np.fromiter(d.values(), dtype=np.float64, count=len(d))
+
+
+def _run_power_flow(net):
+    """
+    Run Newton-Raphson, continuing from the previous solution when there is one.
+
+    After a converged point only the bus P/Q injections are updated (pandapower
+    recycle): the ppc and Y-bus are reused and NR starts from the previous
+    voltages. Falls back to a full flat-start power flow on divergence.
+    """
+    if net.converged:
+        try:
+            pp.runpp(net, init="results", recycle=PF_RECYCLE, **PF_OPTIONS)
+            return
+        except pp.LoadflowNotConverged:
+            pass
+    pp.runpp(net, init="flat", **PF_OPTIONS)
+
+
+def _one_point(args):
+    """
+    Run power flow and compute metrics for a single load multiplier.
+
+    Parameters
+    ----------
+    args : tuple
+        (load_mult, base_load_p, base_load_q, base_sgen_p, base_sgen_q, slack_bus, bus_list)
+
+    Returns
+    -------
+    row : tuple
+        Result row for this load multiplier
+    min_svd : float or None
+        Minimum singular value of the Jacobian (None if power flow failed)
+    """
+    global _worker_prepared
+    load_mult, base_load_p, base_load_q, base_sgen_p, base_sgen_q, slack_bus, bus_list = args
+    net = _worker_net
+
+    net.load.p_mw = load_mult * base_load_p
+    net.load.q_mvar = load_mult * base_load_q
+    net.sgen.p_mw = load_mult * base_sgen_p
+    net.sgen.q_mvar = load_mult * base_sgen_q
+    try:
+        _run_power_flow(net)
+        min_svd = get_svd(net)
+    except Exception:
+        return (load_mult, False, np.nan, np.nan, None, None, None, None, None, None), None
+
+    if _worker_prepared is None:
+        _worker_prepared = prepare_net(net, slack_bus, buses=bus_list)
+    inj_margin, l_index, single_branch, path_accumulated = compute_margins(net, slack_bus=slack_bus,
+                                                                           prepared=_worker_prepared)
+
+    inj_margin_keys, inj_margin_vals = _keys_values(inj_margin)
+    l_index_keys, l_index_vals = _keys_values(l_index)
+    single_branch_keys, single_branch_vals = _keys_values(single_branch)
+    path_accumulated_keys, path_accumulated_vals = _keys_values(path_accumulated)
+
+    inj_margin_min = float(inj_margin_vals.min())
+    l_index_max = float(l_index_vals.max())
+    single_branch_min = float(single_branch_vals.min())
+    path_accumulated_min = float(path_accumulated_vals.min())
+
+    inj_margin_crit_bus = int(inj_margin_keys[inj_margin_vals.argmin()])
+    l_index_crit_bus = int(l_index_keys[l_index_vals.argmin()])
+    single_branch_crit_line = int(single_branch_keys[single_branch_vals.argmin()])
+    path_accumulated_crit = path_accumulated_keys[path_accumulated_vals.argmin()]
+
+    row = (load_mult, True, inj_margin_min, l_index_max, single_branch_min, path_accumulated_min,
+           inj_margin_crit_bus, l_index_crit_bus, single_branch_crit_line, path_accumulated_crit)
+    return row, min_svd
 
 
-def sweep_any_net(net, lam_values, network_name="star"):
+def sweep_any_net(net, lam_values, network_name="star", plot=True):
     """
     Sweep load multiplier and compute voltage stability metrics.
 
@@ -20,59 +125,53 @@ def sweep_any_net(net, lam_values, network_name="star"):
         Load multiplier values to sweep
     network_name : str
         Name for output file labeling
+    plot : bool
+        If True, plot the metrics and save the figure
     """
-    slack_bus = net.ext_grid.bus[0]
+    slack_bus = int(net.ext_grid.bus.iloc[0])
+    bus_list = net.bus.index.tolist()
 
     base_load_p = net.load.p_mw.values.copy()
     base_load_q = net.load.q_mvar.values.copy()
     base_sgen_p = net.sgen.p_mw.values.copy()
     base_sgen_q = net.sgen.q_mvar.values.copy()
-    min_singular_values = []
-    results = []
-
-    for load_mult in lam_values:
-        net.load.p_mw = load_mult * base_load_p
-        net.load.q_mvar = load_mult * base_load_q
-        net.sgen.p_mw = load_mult * base_sgen_p
-        net.sgen.q_mvar = load_mult * base_sgen_q
-        try:
-            pp.runpp(net, algorithm="nr", init="flat", calculate_voltage_angles=True,
-                     max_iteration=50, tolerance_mva=1e-8)
-            min_svd = get_svd(net)
-            min_singular_values.append(min_svd)
-        except Exception:
-            results.append((load_mult, False, np.nan, np.nan, None, None, None, None, None, None))
-            continue
-
-        inj_margin, l_index, single_branch, path_accumulated = compute_margins(net, slack_bus=slack_bus)
 
-        inj_margin_min = float(np.min(list(inj_margin.values())))
-        l_index_max = float(np.max(list(l_index.values())))
-        single_branch_min = float(np.min(list(single_branch.values())))
-        path_accumulated_min = float(np.min(list(path_accumulated.values())))
-
-        inj_margin_crit_bus = int(min(inj_margin, key=lambda b: inj_margin[b]))
-        l_index_crit_bus = int(min(l_index, key=lambda b: l_index[b]))
-        single_branch_crit_line = int(min(single_branch, key=lambda line: single_branch[line]))
-        path_accumulated_crit = min(path_accumulated, key=lambda b: path_accumulated[b])
-
-        results.append((load_mult, True, inj_margin_min, l_index_max, single_branch_min, path_accumulated_min,
-                        inj_margin_crit_bus, l_index_crit_bus, single_branch_crit_line, path_accumulated_crit))
+    args_list = [(load_mult, base_load_p, base_load_q, base_sgen_p, base_sgen_q, slack_bus, bus_list)
+                 for load_mult in lam_values]
+
+    # Sweep points are independent: each worker solves its own copy of the network.
+    # One contiguous chunk per worker so consecutive points can warm-start each other.
+    processes = max(1, min(os.cpu_count() or 1, len(args_list)))
+    chunksize = max(1, -(-len(args_list) // processes))
+    with Pool(processes=processes, initializer=_init_worker, initargs=(pickle.dumps(net),)) as pool:
+        outputs = pool.map(_one_point, args_list, chunksize=chunksize)
+
+    n_points = len(outputs)
+    load_multipliers = np.empty(n_points)
+    pf_converged = np.zeros(n_points, dtype=bool)
+    inj_margin_arr = np.full(n_points, np.nan)
+    l_index_arr = np.full(n_points, np.nan)
+    single_branch_arr = np.full(n_points, np.nan)
+    path_accumulated_arr = np.full(n_points, np.nan)
+    min_singular_values = []
 
     print("load_mult, pf_converged, inj_margin_min, l_index_max, single_branch_min, path_accum_min, crit_buses_lines")
-    for row in results:
+    for i, (row, min_svd) in enumerate(outputs):
         print(row)
+        load_multipliers[i] = row[0]
+        if row[1]:
+            pf_converged[i] = True
+            inj_margin_arr[i], l_index_arr[i], single_branch_arr[i], path_accumulated_arr[i] = row[2:6]
+            min_singular_values.append(min_svd)
 
-    try:
-        set_plot_style(column="one", font_size=8)
+    if not plot:
+        return
 
-        load_multipliers = np.array([row[0] for row in results], dtype=float)
-        pf_converged = np.array([row[1] for row in results], dtype=bool)
+    try:
+        import matplotlib.pyplot as plt
+        from plotting import set_plot_style
 
-        inj_margin_arr = np.array([row[2] for row in results], dtype=float)
-        l_index_arr = np.array([row[3] for row in results], dtype=float)
-        single_branch_arr = np.array([row[4] for row in results], dtype=float)
-        path_accumulated_arr = np.array([row[5] for row in results], dtype=float)
+        set_plot_style(column="one", font_size=8)
 
         x_valid = load_multipliers[pf_converged]
         inj_margin_valid = inj_margin_arr[pf_converged]
@@ -163,9 +262,17 @@ Examples:
         default=200,
         help='Number of load multiplier points (default: 200)'
     )
+    parser.add_argument(
+        '--no-plot',
+        action='store_true',
+        help='Skip plotting (no matplotlib import), e.g. for benchmarking the sweep'
+    )
 
     args = parser.parse_args()
 
+    if not LIGHTSIM2GRID_AVAILABLE:
+        print("lightsim2grid not installed; running power flow with the numba backend only")
+
     if args.network == 'all':
         networks_to_run = ['twobus', 'ieee123', 'star']
     else:
@@ -179,4 +286,4 @@ Examples:
 
         net = config['loader']()
         lam_values = np.linspace(1, config['lam_max'], args.points)
-        sweep_any_net(net, lam_values, network_name=config['name'])
+        sweep_any_net(net, lam_values, network_name=config['name'], plot=not args.no_plot)
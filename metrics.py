@@ -1,7 +1,65 @@
+from dataclasses import dataclass
+
+import networkx as nx
 import numpy as np
+from scipy.sparse.linalg import spsolve
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Fallback no-op decorator when numba is not installed."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+from powerflow import complex_bus_voltage_pu, bus_injection_current_pu, get_Zbus_reduced_pu, sparse_content_key
+from topology import (NetCache, get_branch_cache, get_branch_positions, get_bus_lookup, get_leaf_buses,
+                      get_path_branch_arrays, get_paths_from_bus, path_bus1_to_bus2)
+
+
+# Module-level cache of L-index bus sets and ppc index arrays (topology-only)
+_L_index_cache = NetCache()
+
+
+def _get_L_index_sets(net, gen_buses, load_buses):
+    """
+    Resolve generator/load bus sets for the L-index.
+
+    Returns
+    -------
+    dict
+        L_pp (load buses, pandapower index), G_idx / L_idx (ppc index arrays),
+        bus_idx / bus_ppc (all buses in pandapower and ppc index)
+    """
+    pp2ppc = net._pd2ppc_lookups["bus"]
+
+    if gen_buses is None:
+        G_pp = set(int(b) for b in net.ext_grid.bus.values)
+        if len(net.gen):
+            G_pp |= set(int(b) for b in net.gen.bus.values)
+    else:
+        G_pp = set(int(b) for b in gen_buses)
+
+    all_pp = set(int(b) for b in net.bus.index)
+    if load_buses is None:
+        L_pp = list(sorted(all_pp - G_pp))
+    else:
+        L_pp = list(int(b) for b in load_buses)
+
+    G_pp = list(sorted(G_pp))
+
+    if len(G_pp) == 0 or len(L_pp) == 0:
+        raise ValueError("Generator bus set or load bus set is empty.")
 
-from powerflow import complex_bus_voltage_pu, bus_injection_current_pu, get_Zbus_reduced_pu
-from topology import get_branch_variables, get_leaf_buses, path_bus1_to_bus2
+    bus_idx = net.bus.index.values.astype(np.int64)
+    return {
+        'L_pp': L_pp,
+        'G_idx': pp2ppc[G_pp].astype(np.int64),
+        'L_idx': pp2ppc[L_pp].astype(np.int64),
+        'bus_idx': bus_idx,
+        'bus_ppc': pp2ppc[bus_idx].astype(np.int64),
+    }
 
 
 def compute_L_index(net, *, gen_buses=None, load_buses=None):
@@ -26,61 +84,128 @@ def compute_L_index(net, *, gen_buses=None, load_buses=None):
     crit_bus : int
         Bus with maximum L-index
     """
-    Ybus = net._ppc["internal"]["Ybus"]
-    Y = Ybus.tocsc()
+    if gen_buses is None and load_buses is None:
+        sets = _L_index_cache.get(net)
+        if sets is None:
+            sets = _get_L_index_sets(net, gen_buses, load_buses)
+            _L_index_cache[net] = sets
+    else:
+        sets = _get_L_index_sets(net, gen_buses, load_buses)
 
-    pp2ppc = net._pd2ppc_lookups["bus"]
+    return _compute_L_index_from_sets(net._ppc["internal"]["Ybus"], complex_bus_voltage_pu(net), sets)
 
-    if gen_buses is None:
-        G_pp = set(int(b) for b in net.ext_grid.bus.values)
-        if len(net.gen):
-            G_pp |= set(int(b) for b in net.gen.bus.values)
-    else:
-        G_pp = set(int(b) for b in gen_buses)
 
-    all_pp = set(int(b) for b in net.bus.index)
-    if load_buses is None:
-        L_pp = list(sorted(all_pp - G_pp))
-    else:
-        L_pp = list(int(b) for b in load_buses)
+def _compute_L_index_from_sets(Ybus, V_bus, sets):
+    """
+    Compute the L-index from the Y-bus, complex bus voltages and resolved bus sets.
 
-    G_pp = list(sorted(G_pp))
+    F = -inv(Y_LL) @ Y_LG only depends on the Y-bus; it is stored in sets and
+    recomputed only when the Y-bus changes.
+    """
+    L_pp, G, L = sets['L_pp'], sets['G_idx'], sets['L_idx']
+
+    y_key = sparse_content_key(Ybus)
+    if sets.get('F_key') != y_key:
+        Y = Ybus.tocsr()
+        Y_L = Y[L]
+        Y_LL = Y_L[:, L].tocsc()
+        Y_LG = Y_L[:, G].toarray()
+        sets['F'] = -spsolve(Y_LL, Y_LG).reshape(len(L), len(G))
+        sets['F_key'] = y_key
+    F = sets['F']
+
+    n = Ybus.shape[0]
+    V = np.zeros(n, dtype=complex)
+    V[sets['bus_ppc']] = V_bus[sets['bus_idx']]
 
-    if len(G_pp) == 0 or len(L_pp) == 0:
-        raise ValueError("Generator bus set or load bus set is empty.")
+    Vl = V[L]
+    valid = np.abs(Vl) >= 1e-12
+    L_arr = np.full(len(L), np.inf)
+    L_arr[valid] = np.abs(1.0 - (F[valid] @ V[G]) / Vl[valid])
 
-    G = [int(pp2ppc[b]) for b in G_pp]
-    L = [int(pp2ppc[b]) for b in L_pp]
+    L_by_bus = dict(zip(L_pp, L_arr.tolist()))
 
-    Y_LL = Y[L, :][:, L].toarray()
-    Y_LG = Y[L, :][:, G].toarray()
+    crit_row = int(np.argmax(L_arr))
+    return L_by_bus, float(L_arr[crit_row]), int(L_pp[crit_row])
 
-    F = -np.linalg.solve(Y_LL, Y_LG)
 
-    V_bus = complex_bus_voltage_pu(net)
-    n = Y.shape[0]
-    V = np.zeros(n, dtype=complex)
-    for b in net.bus.index:
-        V[int(pp2ppc[int(b)])] = V_bus[int(b)]
+@dataclass
+class PreparedNet:
+    """
+    Sweep-invariant data of a solved network.
 
-    Vg = V[G]
+    A load sweep only rescales loads, so topology, line parameters, bus
+    index maps and the shortest-path tree rooted at the slack bus stay valid
+    for every point. Tree arrays list every non-slack bus in BFS order
+    (parents before children) with the line towards its parent.
+    """
+    slack_bus: int
+    slack_pos: int
+    buses: list
+    bus_pos: np.ndarray
+    line_ids: list
+    from_pos: np.ndarray
+    to_pos: np.ndarray
+    r_pu: np.ndarray
+    x_pu: np.ndarray
+    l_index_sets: dict
+    tree_pos: np.ndarray
+    parent_pos: np.ndarray
+    tree_line_pos: np.ndarray
+    tree_forward: np.ndarray
+
+
+def prepare_net(net, slack_bus, buses=None):
+    """
+    Collect the sweep-invariant data needed by compute_margins.
 
-    L_by_bus = {}
-    for row, b_pp in enumerate(L_pp):
-        i = int(pp2ppc[b_pp])
-        Vi = V[i]
-        if abs(Vi) < 1e-12:
-            Li = np.inf
-        else:
-            Li = abs(1.0 - np.sum(F[row, :] * (Vg / Vi)))
-        L_by_bus[int(b_pp)] = float(Li)
+    Parameters
+    ----------
+    net : pandapowerNet
+        Solved pandapower network
+    slack_bus : int
+        Slack bus index
+    buses : list, optional
+        Bus indices for the path-accumulated margin. If None, uses all buses.
 
-    crit_bus = max(L_by_bus, key=lambda b: L_by_bus[b])
-    L_max = L_by_bus[crit_bus]
-    return L_by_bus, float(L_max), int(crit_bus)
+    Returns
+    -------
+    PreparedNet
+    """
+    if buses is None:
+        buses = list(set(net.bus.index))
 
+    branch_cache = get_branch_cache(net)
+    bus_lookup = branch_cache['bus_lookup']
 
-def compute_margins(net, slack_bus):
+    paths_from_slack = get_paths_from_bus(net, slack_bus)
+    for bus in buses:
+        if bus not in paths_from_slack:
+            raise nx.NetworkXNoPath(f"No path between {bus} and {slack_bus}.")
+
+    tree_buses = sorted((b for b in paths_from_slack if b != slack_bus), key=lambda b: len(paths_from_slack[b]))
+    parents = [paths_from_slack[b][-2] for b in tree_buses]
+    tree_line_pos, tree_forward = get_branch_positions(net, tree_buses, parents)
+
+    return PreparedNet(
+        slack_bus=slack_bus,
+        slack_pos=int(bus_lookup[slack_bus]),
+        buses=list(buses),
+        bus_pos=bus_lookup[list(buses)],
+        line_ids=net.line.index.tolist(),
+        from_pos=bus_lookup[branch_cache['from_bus']],
+        to_pos=bus_lookup[branch_cache['to_bus']],
+        r_pu=branch_cache['r_pu'],
+        x_pu=branch_cache['x_pu'],
+        l_index_sets=_get_L_index_sets(net, None, None),
+        tree_pos=bus_lookup[tree_buses],
+        parent_pos=bus_lookup[parents],
+        tree_line_pos=tree_line_pos,
+        tree_forward=tree_forward,
+    )
+
+
+def compute_margins(net, slack_bus, buses=None, prepared=None):
     """
     Compute multiple voltage stability margins.
 
@@ -90,6 +215,13 @@ def compute_margins(net, slack_bus):
         Solved pandapower network
     slack_bus : int
         Slack bus index
+    buses : list, optional
+        Bus indices for the path-accumulated margin. If None, uses all buses.
+        Ignored when prepared is given.
+    prepared : PreparedNet, optional
+        Output of prepare_net for this network and slack_bus. If None, it is built here;
+        pass it in when evaluating many operating points of one network.
+        Power flow results are always read from net, never from prepared.
 
     Returns
     -------
@@ -102,49 +234,56 @@ def compute_margins(net, slack_bus):
     multiple_branch_deri : dict
         Path-accumulated margin based on derivative
     """
+    if prepared is None:
+        prepared = prepare_net(net, slack_bus, buses)
+    elif prepared.slack_bus != slack_bus:
+        raise ValueError(f"prepared was built for slack bus {prepared.slack_bus}, not {slack_bus}.")
+
+    vm_sq = net.res_bus.vm_pu.to_numpy()**2
+    p_from = net.res_line.p_from_mw.values / net.sn_mva
+    q_from = net.res_line.q_from_mvar.values / net.sn_mva
+    p_to = net.res_line.p_to_mw.values / net.sn_mva
+    q_to = net.res_line.q_to_mvar.values / net.sn_mva
+
     # --- Wang/Cui/Wang margin ---
     V = complex_bus_voltage_pu(net)
     Iinj = bus_injection_current_pu(net, V)
     Zred, keep = get_Zbus_reduced_pu(net, slack_bus_idx=slack_bus)
     Ired = Iinj[keep]
-    inj_based_margin = {}
-    for a_red, h in enumerate(keep):
-        rhs = 0.0
-        for b_red, i_bus in enumerate(keep):
-            rhs += np.abs(Zred[a_red, b_red] * Ired[b_red])
-        inj_based_margin[h] = np.abs(V[h]) - rhs
+    rhs = np.abs(Zred * Ired[np.newaxis, :]).sum(axis=1)
+    inj_based_margin = dict(zip(keep, (np.abs(V[keep]) - rhs).tolist()))
 
     # --- Kessel & Glavitsch (1986) L-index ---
-    L_by_bus, Lmax, Lcrit = compute_L_index(net)
+    L_by_bus, Lmax, Lcrit = _compute_L_index_from_sets(net._ppc["internal"]["Ybus"], V, prepared.l_index_sets)
 
     # --- Single branch level margin ---
-    single_branch_det = {}
-    for line_idx in net.line.index:
-        branch_vars = get_branch_variables(net, net.line.from_bus[line_idx], net.line.to_bus[line_idx])
-        r, x = branch_vars['r'], branch_vars['x']
-        p_out, q_out = branch_vars['p_out'], branch_vars['q_out']
-        v_send_sq = branch_vars['v_send_sq']
-        single_branch_det[int(line_idx)] = (v_send_sq - 2*(r*p_out + x*q_out))**2
-
-        branch_vars = get_branch_variables(net, net.line.to_bus[line_idx], net.line.from_bus[line_idx])
-        r, x = branch_vars['r'], branch_vars['x']
-        p_out, q_out = branch_vars['p_out'], branch_vars['q_out']
-        v_send_sq = branch_vars['v_send_sq']
-        single_branch_det[len(net.line.index) + int(line_idx)] = (v_send_sq - 2*(r*p_out + x*q_out))**2
-
-    buses = list(set(net.bus.index))
+    r, x = prepared.r_pu, prepared.x_pu
+    det_fwd = (vm_sq[prepared.from_pos] - 2*(r*p_from + x*q_from))**2
+    det_bwd = (vm_sq[prepared.to_pos] - 2*(r*p_to + x*q_to))**2
+
+    line_ids = prepared.line_ids
+    single_branch_det = dict(zip(line_ids, det_fwd.tolist()))
+    single_branch_det.update(zip([len(line_ids) + line_idx for line_idx in line_ids], det_bwd.tolist()))
 
     # --- Multiple branch level margin based on derivative ---
+    # Path sums to the slack share prefixes, so accumulate them outwards over the tree in one pass
+    line_pos, forward = prepared.tree_line_pos, prepared.tree_forward
+    sum_rp_xq, sum_loss = accumulate_tree_sums(
+        prepared.tree_pos, prepared.parent_pos, r[line_pos], x[line_pos],
+        np.where(forward, p_from[line_pos], p_to[line_pos]),
+        np.where(forward, q_from[line_pos], q_to[line_pos]), vm_sq)
+    determinant = (vm_sq[prepared.slack_pos] + 2*sum_rp_xq)**2 - 4*vm_sq*sum_loss
+
     multiple_branch_deri = dict()
-    multiple_branch_deri[net.ext_grid.bus[0]] = 999
+    multiple_branch_deri[slack_bus] = 999
 
-    for bus in buses:
-        multiple_branch_deri[(bus, slack_bus)] = accumulate_determinant(net, bus, slack_bus)
+    for bus, det in zip(prepared.buses, determinant[prepared.bus_pos].tolist()):
+        multiple_branch_deri[(bus, slack_bus)] = 999 if bus == slack_bus else det
 
     return inj_based_margin, L_by_bus, single_branch_det, multiple_branch_deri
 
 
-def accumulate_determinant(net, bus_from, bus_to, terminate_at_slack=True):
+def accumulate_determinant(net, bus_from, bus_to, terminate_at_slack=True, slack_bus=None, vm_pu_arr=None):
     """
     Compute path-accumulated voltage stability determinant.
 
@@ -158,41 +297,99 @@ def accumulate_determinant(net, bus_from, bus_to, terminate_at_slack=True):
         Ending bus
     terminate_at_slack : bool
         If True, terminate path at slack bus
+    slack_bus : int, optional
+        Slack bus index. If None, uses the first ext_grid bus.
+    vm_pu_arr : ndarray, optional
+        Bus voltage magnitudes in res_bus row order. If None, read from net.
 
     Returns
     -------
     float
         Determinant value (999 if path length < 2)
     """
+    if slack_bus is None:
+        slack_bus = int(net.ext_grid.bus.iloc[0])
+
     path = path_bus1_to_bus2(net, bus_from, bus_to)
 
     if len(path) < 2:
         return 999
-    if (net.ext_grid.bus[0] in path) and (bus_from != net.ext_grid.bus[0]):
-        bus_to = net.ext_grid.bus[0]
+    if terminate_at_slack and (slack_bus in path) and (bus_from != slack_bus):
+        path = path[:path.index(slack_bus) + 1]
+        bus_to = slack_bus
 
-    path = path_bus1_to_bus2(net, bus_from, bus_to)
-    sum_rp_xq = 0
-    sum_power_term = 0
-    voltage_sensitivity = dict()
-    voltage_ratio = dict()
-
-    v_from_sq, v_to_sq = net.res_bus.vm_pu[bus_from]**2, net.res_bus.vm_pu[bus_to]**2
-
-    for i in range(len(path)-1):
-        branch_vars = get_branch_variables(net, path[i], path[i+1])
-        rp_xq = branch_vars['rp_xq']
-        z_sq = branch_vars['z_sq']
-        s_sq = branch_vars['s_sq']
-        v_send_sq = branch_vars['v_send_sq']
-
-        if i == 0:
-            voltage_sensitivity[path[i]] = 1
-
-        sum_rp_xq += rp_xq
-        sum_power_term += z_sq * s_sq * v_from_sq / v_send_sq
-        voltage_ratio[(path[i], path[i+1])] = (1 - z_sq * s_sq / (v_send_sq**2))
-        voltage_sensitivity[path[i+1]] = voltage_sensitivity[path[i]] * voltage_ratio[(path[i], path[i+1])]
-
-    determinant = (v_to_sq + 2*sum_rp_xq)**2 - 4*sum_power_term
-    return determinant
+    if vm_pu_arr is None:
+        vm_pu_arr = net.res_bus.vm_pu.to_numpy()
+    bus_lookup = get_bus_lookup(net)
+
+    v_from_sq, v_to_sq = vm_pu_arr[bus_lookup[bus_from]]**2, vm_pu_arr[bus_lookup[bus_to]]**2
+    r, x, p_out, q_out, v_send_sq = get_path_branch_arrays(net, path, vm_pu_arr=vm_pu_arr)
+
+    return accumulate_determinant_core(r, x, p_out, q_out, v_send_sq, v_from_sq, v_to_sq)
+
+
+@njit(cache=True)
+def accumulate_determinant_core(r, x, p_out, q_out, v_send_sq, v_from_sq, v_to_sq):
+    """
+    Accumulate the path determinant from per-branch arrays.
+
+    Parameters
+    ----------
+    r, x : ndarray
+        Branch resistance and reactance in pu, ordered along the path
+    p_out, q_out : ndarray
+        Active/reactive power leaving each sending end in pu
+    v_send_sq : ndarray
+        Squared voltage magnitude at each sending end
+    v_from_sq, v_to_sq : float
+        Squared voltage magnitude at the first and last bus of the path
+
+    Returns
+    -------
+    float
+        Determinant value
+    """
+    sum_rp_xq = 0.0
+    sum_power_term = 0.0
+    for i in range(r.shape[0]):
+        z_sq = r[i]**2 + x[i]**2
+        s_sq = p_out[i]**2 + q_out[i]**2
+        sum_rp_xq += r[i] * p_out[i] + x[i] * q_out[i]
+        sum_power_term += z_sq * s_sq * v_from_sq / v_send_sq[i]
+
+    return (v_to_sq + 2*sum_rp_xq)**2 - 4*sum_power_term
+
+
+@njit(cache=True)
+def accumulate_tree_sums(tree_pos, parent_pos, r, x, p_out, q_out, vm_sq):
+    """
+    Accumulate path sums from the slack outwards over a radial tree.
+
+    Parameters
+    ----------
+    tree_pos, parent_pos : ndarray
+        Bus and parent bus positions of every tree edge, parents first
+    r, x : ndarray
+        Resistance and reactance in pu of each tree edge
+    p_out, q_out : ndarray
+        Active/reactive power leaving each bus towards its parent, in pu
+    vm_sq : ndarray
+        Squared bus voltage magnitudes
+
+    Returns
+    -------
+    sum_rp_xq : ndarray
+        Sum of r*p_out + x*q_out along each bus's path to the slack
+    sum_loss : ndarray
+        Sum of z^2 * s^2 / v_send^2 along each bus's path to the slack
+    """
+    sum_rp_xq = np.zeros(vm_sq.shape[0])
+    sum_loss = np.zeros(vm_sq.shape[0])
+    for i in range(tree_pos.shape[0]):
+        bus = tree_pos[i]
+        parent = parent_pos[i]
+        z_sq = r[i]**2 + x[i]**2
+        s_sq = p_out[i]**2 + q_out[i]**2
+        sum_rp_xq[bus] = sum_rp_xq[parent] + r[i] * p_out[i] + x[i] * q_out[i]
+        sum_loss[bus] = sum_loss[parent] + z_sq * s_sq / vm_sq[bus]
+    return sum_rp_xq, sum_loss
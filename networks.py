@@ -1,16 +1,22 @@
+import copy
+import functools
 import pickle
 
+
+@functools.lru_cache(maxsize=None)
+def _load_pickle(path):
+    """Deserialize a network once per process; callers get deep copies."""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
 def star_network():
-    with open("networks/starnet.pkl", "rb") as f:
-        net = pickle.load(f)
+    net = copy.deepcopy(_load_pickle("networks/starnet.pkl"))
     return net
 
 def twobus_net(v_slack_pu=1.0, r_ohm=0.2, x_ohm=0.4, vn_kv=20.0):
-    with open("networks/twobus.pkl", "rb") as f:
-        net = pickle.load(f)
+    net = copy.deepcopy(_load_pickle("networks/twobus.pkl"))
     return net
 
 def ieee123():
-    with open("networks/ieee123.pkl", "rb") as f:
-        net = pickle.load(f)
+    net = copy.deepcopy(_load_pickle("networks/ieee123.pkl"))
     return net
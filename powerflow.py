@@ -1,5 +1,14 @@
+import hashlib
+
 import numpy as np
-from numpy.linalg import inv
+import scipy.linalg
+from scipy.sparse.linalg import LinearOperator, splu, svds
+
+from topology import NetCache
+
+
+# Module-level cache of the reduced Y-bus factorization, per network and slack bus
+_Yred_lu_cache = NetCache()
 
 
 def complex_bus_voltage_pu(net):
@@ -20,11 +29,67 @@ def bus_injection_current_pu(net, V_pu):
     return I_pu
 
 
+def sparse_content_key(Y):
+    """Content key of a sparse matrix, used to detect Y-bus changes.
+
+    A 256-bit BLAKE2b digest of the CSR arrays, so a collision cannot silently
+    reuse a factorization of a different matrix.
+    """
+    Y = Y.tocsr()
+    h = hashlib.blake2b(digest_size=32)
+    h.update(repr((Y.shape, Y.dtype.str, Y.indices.dtype.str, Y.indptr.dtype.str)).encode())
+    for arr in (Y.data, Y.indices, Y.indptr):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.digest()
+
+
+def _get_Yred_factors(net, slack_bus_idx):
+    """Get cached (lu, Zred, keep) for the reduced Y-bus, refactoring only if Y-bus changed."""
+    Ybus = net._ppc["internal"]["Ybus"]  # scipy sparse (pu)
+    y_key = sparse_content_key(Ybus)
+
+    factors_by_slack = _Yred_lu_cache.get(net)
+    if factors_by_slack is None:
+        factors_by_slack = {}
+        _Yred_lu_cache[net] = factors_by_slack
+    cached = factors_by_slack.get(slack_bus_idx)
+    if cached is not None and cached[0] == y_key:
+        return cached[1:]
+
+    Y = Ybus.tocsc()
+    n = Y.shape[0]
+    keep = [i for i in range(n) if i != slack_bus_idx]
+    Yred = Y[keep, :][:, keep].tocsc()
+    lu = splu(Yred)
+    Zred = lu.solve(np.eye(len(keep), dtype=complex))
+    factors_by_slack[slack_bus_idx] = (y_key, lu, Zred, keep)
+    return lu, Zred, keep
+
+
+def get_Yred_lu(net, slack_bus_idx):
+    """
+    Get sparse LU factorization of the reduced Y-bus (slack bus eliminated).
+
+    Note: runpp must have been called before using this function.
+
+    Returns
+    -------
+    lu : scipy.sparse.linalg.SuperLU
+        Factorization of the reduced Y-bus; lu.solve(I) gives Zred @ I
+    keep : list
+        Mapping from reduced index to original bus index
+    """
+    lu, _, keep = _get_Yred_factors(net, slack_bus_idx)
+    return lu, keep
+
+
 def get_Zbus_reduced_pu(net, slack_bus_idx):
     """
     Get reduced Z-bus matrix (slack bus eliminated) in per-unit.
 
-    Note: runpp must have been called before using this function.
+    Note: runpp must have been called before using this function. The matrix
+    is obtained from a sparse LU of the reduced Y-bus and reused as long as
+    the Y-bus is unchanged (e.g. across a load sweep).
 
     Returns
     -------
@@ -33,13 +98,7 @@ def get_Zbus_reduced_pu(net, slack_bus_idx):
     keep : list
         Mapping from reduced index to original bus index
     """
-    Ybus = net._ppc["internal"]["Ybus"]  # scipy sparse (pu)
-    Y = Ybus.tocsc()
-
-    n = Y.shape[0]
-    keep = [i for i in range(n) if i != slack_bus_idx]
-    Yred = Y[keep, :][:, keep].toarray()
-    Zred = inv(Yred)
+    _, Zred, keep = _get_Yred_factors(net, slack_bus_idx)
     return Zred, keep
 
 
@@ -56,8 +115,24 @@ def line_z_pu(net, line_idx):
 
 
 def get_svd(net):
-    """Get minimum singular value of the Jacobian matrix."""
-    J = net._ppc["internal"]["J"]
-    a = J.tocsc()
-    b = a.toarray()
-    return np.linalg.svdvals(b)[-1]
+    """
+    Get minimum singular value of the Jacobian matrix.
+
+    Computed as 1 / sigma_max(J^-1) with ARPACK on a sparse-LU inverse
+    operator, so J is never densified.
+    """
+    J = net._ppc["internal"]["J"].tocsc()
+    n = J.shape[0]
+    if n < 2:
+        # ARPACK needs k=1 < n; a 1x1 Jacobian is its own singular value
+        return scipy.linalg.svdvals(J.toarray())[-1]
+
+    try:
+        lu = splu(J)
+    except RuntimeError:
+        # Exactly singular Jacobian
+        return 0.0
+
+    J_inv = LinearOperator((n, n), matvec=lu.solve, rmatvec=lambda y: lu.solve(y, trans='T'), dtype=J.dtype)
+    sigma_inv_max = svds(J_inv, k=1, return_singular_vectors=False)[0]
+    return 1.0 / sigma_inv_max
@@ -1,9 +1,47 @@
+import weakref
+
+import numpy as np
 import pandapower.topology as top
 import networkx as nx
 
 
-# Module-level cache for branch index lookup
-_branch_idx_cache = {}
+class NetCache:
+    """
+    Cache keyed by network object.
+
+    pandapowerNet is an unhashable dict, so entries are stored under id(net)
+    together with a weak reference to the network. An entry is dropped when
+    its network is garbage collected, so a recycled id never serves stale data.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, net, default=None):
+        entry = self._entries.get(id(net))
+        if entry is None or entry[0]() is not net:
+            return default
+        return entry[1]
+
+    def __setitem__(self, net, value):
+        net_id = id(net)
+        entries = self._entries
+
+        def _evict(_, net_id=net_id):
+            entries.pop(net_id, None)
+
+        entries[net_id] = (weakref.ref(net, _evict), value)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Module-level cache of per-network line topology arrays (structure of arrays)
+_branch_idx_cache = NetCache()
+
+# Module-level caches of the network graph and of shortest paths from a root bus
+_graph_cache = NetCache()
+_paths_cache = NetCache()
 
 
 def get_dict_busdir_to_branchidx(net):
@@ -19,7 +57,60 @@ def get_dict_busdir_to_branchidx(net):
     return bus_pair_to_line
 
 
-def get_branch_variables(net, sending_bus, receiving_bus):
+def get_branch_cache(net):
+    """
+    Get the cached topology arrays of the network's lines.
+
+    Only data that does not change between power flows is cached; power flow
+    results are always read from the network at call time.
+
+    Returns
+    -------
+    dict
+        pair_to_idx (bus pair to line position), bus_lookup (bus index to
+        res_bus row), from_bus / to_bus, r_pu / x_pu (positional, pu)
+    """
+    cache = _branch_idx_cache.get(net)
+    if cache is None:
+        vn_kv = float(net.bus.vn_kv.loc[0])
+        Zbase = (vn_kv**2) / net.sn_mva
+
+        line_pos = {idx: pos for pos, idx in enumerate(net.line.index)}
+        pair_to_idx = {pair: line_pos[idx] for pair, idx in get_dict_busdir_to_branchidx(net).items()}
+
+        bus_index = net.bus.index.values
+        bus_lookup = np.full(int(bus_index.max()) + 1, -1, dtype=np.int64)
+        bus_lookup[bus_index] = np.arange(len(bus_index))
+
+        length = net.line.length_km.values
+        cache = {
+            'pair_to_idx': pair_to_idx,
+            'bus_lookup': bus_lookup,
+            'from_bus': net.line.from_bus.values,
+            'to_bus': net.line.to_bus.values,
+            'r_pu': length * net.line.r_ohm_per_km.values / Zbase,
+            'x_pu': length * net.line.x_ohm_per_km.values / Zbase,
+        }
+        _branch_idx_cache[net] = cache
+    return cache
+
+
+def _get_branch_position(pair_to_idx, sending_bus, receiving_bus):
+    """Return (line position, True if sending_bus is the line's from_bus)."""
+    if (sending_bus, receiving_bus) in pair_to_idx:
+        return pair_to_idx[(sending_bus, receiving_bus)], True
+    elif (receiving_bus, sending_bus) in pair_to_idx:
+        return pair_to_idx[(receiving_bus, sending_bus)], False
+    else:
+        raise Exception(f'There is no such branch {sending_bus}-{receiving_bus}')
+
+
+def get_bus_lookup(net):
+    """Get the cached array mapping bus index to row position in net.bus / net.res_bus."""
+    return get_branch_cache(net)['bus_lookup']
+
+
+def get_branch_variables(net, sending_bus, receiving_bus, vm_pu_arr=None):
     """
     Get branch variables for power flow analysis.
 
@@ -31,6 +122,8 @@ def get_branch_variables(net, sending_bus, receiving_bus):
         Sending end bus index
     receiving_bus : int
         Receiving end bus index
+    vm_pu_arr : ndarray, optional
+        Bus voltage magnitudes in res_bus row order. If None, read from net.
 
     Returns
     -------
@@ -46,35 +139,23 @@ def get_branch_variables(net, sending_bus, receiving_bus):
         - z_sq_s_sq: (r^2 + x^2) * (p_out^2 + q_out^2)
         - s_sq: p_out^2 + q_out^2 (apparent power squared)
     """
-    global _branch_idx_cache
-
-    vn_kv = float(net.bus.vn_kv.loc[0])
-    Zbase = (vn_kv**2) / net.sn_mva
-
-    # Build cache if needed
-    net_id = id(net)
-    if net_id not in _branch_idx_cache:
-        _branch_idx_cache[net_id] = get_dict_busdir_to_branchidx(net)
-    bus_pair_to_line = _branch_idx_cache[net_id]
-
-    p_out, q_out, line_idx = None, None, None
-    if (sending_bus, receiving_bus) in bus_pair_to_line:
-        line_idx = bus_pair_to_line[(sending_bus, receiving_bus)]
-        p_out = net.res_line.p_from_mw[line_idx] / net.sn_mva
-        q_out = net.res_line.q_from_mvar[line_idx] / net.sn_mva
-
-    elif (receiving_bus, sending_bus) in bus_pair_to_line:
-        line_idx = bus_pair_to_line[(receiving_bus, sending_bus)]
-        p_out = net.res_line.p_to_mw[line_idx] / net.sn_mva
-        q_out = net.res_line.q_to_mvar[line_idx] / net.sn_mva
+    cache = get_branch_cache(net)
 
+    line_pos, forward = _get_branch_position(cache['pair_to_idx'], sending_bus, receiving_bus)
+    if forward:
+        p_out = net.res_line.p_from_mw.values[line_pos] / net.sn_mva
+        q_out = net.res_line.q_from_mvar.values[line_pos] / net.sn_mva
     else:
-        raise Exception(f'There is no such branch {sending_bus}-{receiving_bus}')
+        p_out = net.res_line.p_to_mw.values[line_pos] / net.sn_mva
+        q_out = net.res_line.q_to_mvar.values[line_pos] / net.sn_mva
+
+    if vm_pu_arr is None:
+        vm_pu_arr = net.res_bus.vm_pu.values
 
-    r = net.line.loc[line_idx, 'length_km'] * net.line.loc[line_idx, 'r_ohm_per_km'] / Zbase
-    x = net.line.loc[line_idx, 'length_km'] * net.line.loc[line_idx, 'x_ohm_per_km'] / Zbase
-    v_send_sq = net.res_bus.loc[sending_bus, 'vm_pu']**2
-    v_recv_sq = net.res_bus.loc[receiving_bus, 'vm_pu']**2
+    r = cache['r_pu'][line_pos]
+    x = cache['x_pu'][line_pos]
+    v_send_sq = vm_pu_arr[cache['bus_lookup'][sending_bus]]**2
+    v_recv_sq = vm_pu_arr[cache['bus_lookup'][receiving_bus]]**2
     s_sq = p_out**2 + q_out**2
     z_sq = r**2 + x**2
     power_loss_ratio = s_sq / v_send_sq
@@ -91,6 +172,73 @@ def get_branch_variables(net, sending_bus, receiving_bus):
     }
 
 
+def get_path_branch_positions(net, path):
+    """
+    Get line positions and directions along a path.
+
+    Returns
+    -------
+    line_pos : ndarray
+        Position (in net.line) of each branch along the path
+    forward : ndarray
+        True where the branch is traversed from its from_bus to its to_bus
+    """
+    return get_branch_positions(net, path[:-1], path[1:])
+
+
+def get_branch_positions(net, sending_buses, receiving_buses):
+    """
+    Get line positions and directions for (sending, receiving) bus pairs.
+
+    Returns
+    -------
+    line_pos : ndarray
+        Position (in net.line) of each branch
+    forward : ndarray
+        True where the sending bus is the line's from_bus
+    """
+    pair_to_idx = get_branch_cache(net)['pair_to_idx']
+
+    n_edges = len(sending_buses)
+    line_pos = np.empty(n_edges, dtype=np.int64)
+    forward = np.empty(n_edges, dtype=bool)
+    for i, (sending_bus, receiving_bus) in enumerate(zip(sending_buses, receiving_buses)):
+        line_pos[i], forward[i] = _get_branch_position(pair_to_idx, sending_bus, receiving_bus)
+    return line_pos, forward
+
+
+def get_path_branch_arrays(net, path, vm_pu_arr=None):
+    """
+    Gather branch variables along a path as NumPy arrays.
+
+    Parameters
+    ----------
+    net : pandapowerNet
+        Solved pandapower network
+    path : list
+        Bus sequence; each consecutive pair is a (sending, receiving) branch
+    vm_pu_arr : ndarray, optional
+        Bus voltage magnitudes in res_bus row order. If None, read from net.
+
+    Returns
+    -------
+    tuple of ndarray
+        (r, x, p_out, q_out, v_send_sq) per branch along the path, in pu
+    """
+    cache = get_branch_cache(net)
+    line_pos, forward = get_path_branch_positions(net, path)
+    if vm_pu_arr is None:
+        vm_pu_arr = net.res_bus.vm_pu.values
+
+    r = cache['r_pu'][line_pos]
+    x = cache['x_pu'][line_pos]
+    res_line = net.res_line
+    p_out = np.where(forward, res_line.p_from_mw.values[line_pos], res_line.p_to_mw.values[line_pos]) / net.sn_mva
+    q_out = np.where(forward, res_line.q_from_mvar.values[line_pos], res_line.q_to_mvar.values[line_pos]) / net.sn_mva
+    v_send_sq = vm_pu_arr[cache['bus_lookup'][path[:-1]]]**2
+    return r, x, p_out, q_out, v_send_sq
+
+
 def get_leaf_buses(net, include_trafos=True, respect_switches=True):
     """Get leaf (terminal) buses in the network, excluding slack bus."""
     G = top.create_nxgraph(
@@ -107,8 +255,29 @@ def get_leaf_buses(net, include_trafos=True, respect_switches=True):
     return leaf_buses
 
 
+def _get_nxgraph(net):
+    """Get the cached NetworkX graph of the network."""
+    G = _graph_cache.get(net)
+    if G is None:
+        G = top.create_nxgraph(net)
+        _graph_cache[net] = G
+    return G
+
+
+def get_paths_from_bus(net, root_bus):
+    """Get shortest paths from root_bus to every reachable bus (cached per root)."""
+    paths_by_root = _paths_cache.get(net)
+    if paths_by_root is None:
+        paths_by_root = {}
+        _paths_cache[net] = paths_by_root
+    if root_bus not in paths_by_root:
+        paths_by_root[root_bus] = nx.single_source_shortest_path(_get_nxgraph(net), root_bus)
+    return paths_by_root[root_bus]
+
+
 def path_bus1_to_bus2(net, bus_from, bus_to):
     """Find shortest path between two buses."""
-    G = top.create_nxgraph(net)
-    path = nx.shortest_path(G, source=bus_from, target=bus_to)
-    return path
+    paths = get_paths_from_bus(net, bus_to)
+    if bus_from not in paths:
+        raise nx.NetworkXNoPath(f"No path between {bus_from} and {bus_to}.")
+    return paths[bus_from][::-1]